@@ -0,0 +1,106 @@
+"""
+Shared extraction code for the noon.com gaming-laptop scrapers.
+
+The scrapers only differ in how they fetch a results page (Playwright or httpx);
+everything that happens once the HTML is in hand lives here.
+"""
+from selectolax.lexbor import LexborHTMLParser
+import csv
+import hashlib
+import os
+
+# URL base and output columns
+BASE_URL = "https://www.noon.com/egypt-en/eg-gaming-laptops/?page={page}"
+COLUMNS = ["Product_name", "Rating", "Price", "Product_link", "Image_link"]
+
+# CSS selectors for the product card and its fields (matched by selectolax's lexbor C engine).
+# The desktop page wraps each card in PRODUCT_SEL; the mobile page only has the LINK_SEL anchor.
+PRODUCT_SEL = "div.ProductBoxLinkHandler_linkWrapper__b0qZ9"
+TITLE_SEL = "h2.ProductDetailsSection_title__JorAV"
+PRICE_SEL = "strong.Price_amount__2sXa7"
+RATING_SEL = ".RatingPreviewStar_textCtr__sfsJG"
+LINK_SEL = "a.ProductBoxLinkHandler_productBoxLink__FPhjp"
+IMAGE_SEL = "img.ProductImageCarousel_productImage__jtsOn"
+
+# Optional on-disk HTML cache for selector development (enable with SCRAPER_CACHE=1)
+CACHE_DIR = ".cache"
+SCRAPER_CACHE = os.getenv("SCRAPER_CACHE") == "1"
+
+
+def extract_products_from_html(html):
+    """Parse one results page and return a list of product dicts keyed by COLUMNS."""
+    records = []
+
+    tree = LexborHTMLParser(html)
+
+    # Find product containers (fall back to the bare product links on the mobile layout)
+    products = tree.css(PRODUCT_SEL) or tree.css(LINK_SEL)
+
+    for product in products:
+        # Title
+        title_tag = product.css_first(TITLE_SEL)
+        title = title_tag.text(strip=True) if title_tag else "N/A"
+
+        # Price
+        price_tag = product.css_first(PRICE_SEL)
+        price = price_tag.text(strip=True) if price_tag else "N/A"
+
+        # Rating
+        rating_tag = product.css_first(RATING_SEL)
+        rating = rating_tag.text(strip=True) if rating_tag else "N/A"
+
+        # Product Link
+        link_tag = product if product.tag == "a" else product.css_first(LINK_SEL)
+        if link_tag and link_tag.attributes.get('href'):
+            product_link = "https://www.noon.com" + link_tag.attributes['href']
+        else:
+            product_link = "N/A"
+
+        # Image Link (check src or data-src)
+        img_tag = product.css_first(IMAGE_SEL)
+        if img_tag:
+            image_link = img_tag.attributes.get('src') or img_tag.attributes.get('data-src') or 'N/A'
+        else:
+            image_link = "N/A"
+
+        records.append({
+            "Product_name": title,
+            "Rating": rating,
+            "Price": price,
+            "Product_link": product_link,
+            "Image_link": image_link
+        })
+
+    return records
+
+
+def cache_path(url, backend="rendered"):
+    """Return the cache file path for a URL fetched by the given backend ("rendered" or "static"), keyed by its SHA-1 hash."""
+    return os.path.join(CACHE_DIR, f"{hashlib.sha1(url.encode()).hexdigest()}.{backend}.html")
+
+
+def read_cached_html(url, backend="rendered"):
+    """Return cached HTML for url, or None if caching is off or the page was never stored."""
+    path = cache_path(url, backend)
+    if not SCRAPER_CACHE or not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def write_cached_html(url, html, backend="rendered"):
+    """Store fetched HTML for url when caching is on."""
+    if not SCRAPER_CACHE:
+        return
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(cache_path(url, backend), "w", encoding="utf-8") as f:
+        f.write(html)
+
+
+def write_records_csv(records, path):
+    """Stream product records (any iterable of dicts) into a CSV file with the COLUMNS header."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record)
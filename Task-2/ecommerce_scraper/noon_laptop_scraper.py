@@ -1,109 +1,151 @@
-from playwright.sync_api import sync_playwright
-from bs4 import BeautifulSoup
+from playwright.async_api import async_playwright
+from contextlib import asynccontextmanager
+from noon_common import (
+    BASE_URL, PRODUCT_SEL, TITLE_SEL, PRICE_SEL, RATING_SEL, LINK_SEL, IMAGE_SEL, SCRAPER_CACHE,
+    extract_products_from_html, read_cached_html, write_cached_html, write_records_csv
+)
 import pandas as pd
-import time
-
-# Lists to store data
-titles = []
-prices = []
-ratings = []
-product_links = []
-image_links = []
-
-# URL base
-base_url = "https://www.noon.com/egypt-en/eg-gaming-laptops/?page={page}"
-
-# Start Playwright with Chromium
-with sync_playwright() as p:
-    # Launch browser (set headless=False if you want to see the browser)
-    browser = p.chromium.launch(headless=False, timeout=60000)
-    page_context = browser.new_context(
-        viewport={"width": 1920, "height": 1080},
-        user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36"
-    )
-    page = page_context.new_page()
-
-    for current_page in range(1, 6):
-        url = base_url.format(page=current_page)
-        print(f"Scraping page {current_page}: {url}")
+import asyncio
+import os
+
+# Maximum number of pages loaded at the same time (keeps us under bot detection)
+MAX_PARALLEL_PAGES = 3
+
+# Headless Chromium flags: no GPU/pixel work and no image decoding inside Blink
+BROWSER_ARGS = ["--disable-gpu", "--disable-dev-shm-usage", "--blink-settings=imagesEnabled=false"]
+
+# Chromium's sandbox stays on by default; set CHROMIUM_NO_SANDBOX=1 only when running as root inside a container
+if os.getenv("CHROMIUM_NO_SANDBOX") == "1":
+    BROWSER_ARGS.append("--no-sandbox")
+
+# Requests that are not needed to read product text are aborted in the browser
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media", "stylesheet"}
+BLOCKED_HOSTS = ("google-analytics.com", "googletagmanager.com", "doubleclick.net", "facebook.net", "analytics.tiktok.com")
+
+# Runs inside the page and turns every product card into a record, so only small JSON objects cross
+# the CDP bridge instead of the serialized DOM (mirrors extract_products_from_html)
+EXTRACT_PRODUCTS_JS = """
+(cards, sel) => cards.map(card => {
+    const text = s => card.querySelector(s)?.innerText?.trim() || "N/A";
+    const link = card.matches(sel.link) ? card : card.querySelector(sel.link);
+    const href = link?.getAttribute("href");
+    const img = card.querySelector(sel.image);
+    return {
+        Product_name: text(sel.title),
+        Rating: text(sel.rating),
+        Price: text(sel.price),
+        Product_link: href ? "https://www.noon.com" + href : "N/A",
+        Image_link: (img && (img.getAttribute("src") || img.getAttribute("data-src"))) || "N/A"
+    };
+})
+"""
+FIELD_SELECTORS = {"title": TITLE_SEL, "price": PRICE_SEL, "rating": RATING_SEL, "link": LINK_SEL, "image": IMAGE_SEL}
+
+
+async def block_heavy_resources(route):
+    """Abort images, fonts, media, stylesheets and analytics beacons; let everything else through."""
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or any(host in request.url for host in BLOCKED_HOSTS):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+@asynccontextmanager
+async def noon_browser():
+    """Start Chromium once and yield a browser context that can be shared by many scrape_pages calls."""
+    async with async_playwright() as p:
+        # Launch browser headless (set headless=False and drop BROWSER_ARGS to watch it)
+        browser = await p.chromium.launch(headless=True, args=BROWSER_ARGS, timeout=60000)
+        context = await browser.new_context(
+            viewport={"width": 1920, "height": 1080},
+            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36"
+        )
+        await context.route("**/*", block_heavy_resources)
+        try:
+            yield context
+        finally:
+            # Close browser
+            await browser.close()
+
+
+async def fetch_records(context, semaphore, url, fresh=False):
+    """Return the product records of url, parsed from the on-disk cache unless fresh=True, otherwise read from the live DOM."""
+    if not fresh:
+        html = read_cached_html(url)
+        if html is not None:
+            return extract_products_from_html(html)
+
+    async with semaphore:
+        page = await context.new_page()
 
         try:
             # Navigate to the page
-            page.goto(url, timeout=60000, wait_until="networkidle")  # Wait until network is idle
-
-            # Optional: Wait for product containers to load
-            page.wait_for_selector("div.ProductBoxLinkHandler_linkWrapper__b0qZ9", timeout=10000)
-
-            # Get the HTML content after JS loads
-            html = page.content()
-            soup = BeautifulSoup(html, "html.parser")
-
-            # Find product containers
-            products = soup.find_all("div", class_="ProductBoxLinkHandler_linkWrapper__b0qZ9")
-
-            if not products:
-                print(f"No products found on page {current_page}")
-                continue
-
-            for product in products:
-                # Title
-                title_tag = product.select_one("h2.ProductDetailsSection_title__JorAV")
-                title = title_tag.get_text(strip=True) if title_tag else "N/A"
-                titles.append(title)
-
-                # Price
-                price_tag = product.select_one("strong.Price_amount__2sXa7")
-                price = price_tag.get_text(strip=True) if price_tag else "N/A"
-                prices.append(price)
-
-                # Rating
-                rating_tag = product.select_one("span.RatingPreviewStar_textCtr__sfsJG")
-                rating = rating_tag.get_text(strip=True) if rating_tag else "N/A"
-                ratings.append(rating)
-
-                # Product Link
-                link_tag = product.select_one('a.ProductBoxLinkHandler_productBoxLink__FPhjp')
-                if link_tag and 'href' in link_tag.attrs:
-                    product_link = "https://www.noon.com" + link_tag['href']
-                else:
-                    product_link = "N/A"
-                product_links.append(product_link)
-
-                # Image Link (check src or data-src)
-                img_tag = product.select_one('img.ProductImageCarousel_productImage__jtsOn')
-                if img_tag:
-                    image_link = img_tag.get('src') or img_tag.get('data-src', 'N/A')
-                else:
-                    image_link = "N/A"
-                image_links.append(image_link)
-
-            print(f"✅ Scraped page {current_page} with {len(products)} products.")
-
-        except Exception as e:
-            print(f"❌ Error on page {current_page}: {e}")
-            continue
-
-        time.sleep(2)  # Be respectful to the server
-
-    # Close browser
-    browser.close()
-
-# Create DataFrame
-df = pd.DataFrame({
-    "Product_name": titles,
-    "Rating": ratings,
-    "Price": prices,
-    "Product_link": product_links,
-    "Image_link": image_links
-})
+            await page.goto(url, timeout=60000, wait_until="domcontentloaded")
+
+            # Wait for product containers to load
+            await page.wait_for_selector(PRODUCT_SEL, timeout=10000)
+
+            # Extract every card in one evaluate call instead of exporting and re-parsing the full HTML
+            records = await page.eval_on_selector_all(PRODUCT_SEL, EXTRACT_PRODUCTS_JS, FIELD_SELECTORS)
+
+            # The full DOM is only serialized when it is going to be cached
+            if SCRAPER_CACHE:
+                write_cached_html(url, await page.content())
+        finally:
+            await page.close()
+
+    return records
+
+
+async def scrape_url(context, semaphore, url):
+    """Render one results URL in its own tab of the shared context and return its product records."""
+    print(f"Scraping (Playwright): {url}")
+    try:
+        records = await fetch_records(context, semaphore, url)
+    except Exception as e:
+        print(f"❌ Error on {url}: {e}")
+        return []
+
+    if not records:
+        print(f"No products found on {url}")
+    else:
+        print(f"✅ Scraped {url} with {len(records)} products.")
+    return records
+
+
+async def scrape_urls(context, urls):
+    """Render the given URLs concurrently with an already started context; returns one record list per URL."""
+    semaphore = asyncio.Semaphore(MAX_PARALLEL_PAGES)
+    return await asyncio.gather(*(scrape_url(context, semaphore, url) for url in urls))
+
+
+async def scrape_pages(context, pages):
+    """Fetch the given result pages concurrently with an already started context and return all records."""
+    results = await scrape_urls(context, [BASE_URL.format(page=i) for i in pages])
+
+    # Concatenate per-page records in page order
+    return [record for page_records in results for record in page_records]
+
+
+async def scrape():
+    """Fetch pages 1-5 with a single browser start."""
+    async with noon_browser() as context:
+        return await scrape_pages(context, list(range(1, 6)))
+
 
-# Output
-print("\nDataFrame shape:", df.shape)
-print("Number of items scraped:", len(df))
+if __name__ == "__main__":
+    output_path = "Task-2/ecommerce_scraper/noon_gaming_laptops.csv"
+    records = asyncio.run(scrape())
 
-# Save to CSV
-try:
-    df.to_csv("Task-2/ecommerce_scraper/noon_gaming_laptops.csv", index=False)
-    print("\n✅ CSV file saved as 'noon_gaming_laptops.csv'")
-except Exception as e:
-    print(f"❌ Error saving CSV: {e}")
\ No newline at end of file
+    # Save to CSV (rows are written directly, no DataFrame is built for the export)
+    try:
+        write_records_csv(records, output_path)
+        print("\n✅ CSV file saved as 'noon_gaming_laptops.csv'")
+    except Exception as e:
+        print(f"❌ Error saving CSV: {e}")
+    else:
+        # Output
+        df = pd.read_csv(output_path)
+        print("\nDataFrame shape:", df.shape)
+        print("Number of items scraped:", len(df))
@@ -1,19 +1,10 @@
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import httpx
+from noon_common import BASE_URL, extract_products_from_html, read_cached_html, write_cached_html, write_records_csv
 import pandas as pd
-import time
 
-# Lists to store data
-titles = []
-prices = []
-ratings = []
-product_links = []
-image_links = []
 
-
-for page in range(1, 6):
-    url = f"https://www.noon.com/egypt-en/eg-gaming-laptops/?page={page}"
-    headers = {
+headers = {
     "accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
     "accept-language": "en,ar-AE;q=0.9,ar;q=0.8,en-US;q=0.7",
     "cache-control": "max-age=0",
@@ -31,58 +22,55 @@ for page in range(1, 6):
 }
 
 
-    response = requests.get(url, headers=headers)
-    print(f"Page {page} status:", response.status_code)
-
-    soup = BeautifulSoup(response.content, "html.parser")
-    products = soup.select('a.ProductBoxLinkHandler_productBoxLink__FPhjp')
-
-    if not products:
-        print(f"No products found on page {page}")
-        break
-
-    for product in products:
-        # Title
-        title_tag = product.select_one("h2.ProductDetailsSection_title__JorAV")
-        title = title_tag.text.strip() if title_tag else "N/A"
-        titles.append(title)
-
-        # Price
-        price_tag = product.select_one("strong.Price_amount__2sXa7")
-        price = price_tag.text.strip() if price_tag else "N/A"
-        prices.append(price)
-
-        # Rating
-        rating_tag = product.select_one("div.RatingPreviewStar_textCtr__sfsJG")
-        rating = rating_tag.text.strip() if rating_tag else "N/A"
-        ratings.append(rating)
-
-        # Product Link
-        href = product.get('href')
-        full_link = "https://www.noon.com" + href if href else "N/A"
-        product_links.append(full_link)
-
-        # Image link
-        img_tag = product.select_one("img.ProductImageCarousel_productImage__jtsOn")
-        img_src = img_tag['src'] if img_tag else "N/A"
-        image_links.append(img_src)
-
-    print(f"✅ Scraped page {page} with {len(products)} products.")
-    time.sleep(1)  # Be polite
-    
-    
-# Create DataFrame
-df = pd.DataFrame({
-    "Product_name": titles,
-    "Rating": ratings,
-    "Price": prices,
-    "Product_link": product_links,
-    "Image_link": image_links
-})
+urls = [BASE_URL.format(page=i) for i in range(1, 6)]
+
+
+async def fetch_records(client, url):
+    """Return the product records of url's static HTML, from the on-disk cache when available, otherwise over the network."""
+    html = read_cached_html(url, backend="static")
+    if html is not None:
+        print(f"{url} served from cache")
+        return extract_products_from_html(html)
+
+    response = await client.get(url)
+    print(f"{url} status:", response.status_code)
+    records = extract_products_from_html(response.text)
+
+    # Only successful pages with products are cached (error/captcha pages and fallback pages are not replayed)
+    if response.status_code == 200 and records:
+        write_cached_html(url, response.text, backend="static")
+    return records
+
+
+async def fetch_all(urls, headers):
+    """Fetch and parse all result pages concurrently over one HTTP/2 client."""
+    limits = httpx.Limits(max_connections=5)
+    async with httpx.AsyncClient(headers=headers, http2=True, timeout=30, limits=limits) as client:
+        return await asyncio.gather(*(fetch_records(client, u) for u in urls))
 
-# Output
-print("\nDataFrame shape:", df.shape)
-print("Number of items scraped:", len(df))
+
+async def render_with_playwright(urls):
+    """Fallback for pages whose static HTML had no products: render them in one shared browser."""
+    # Imported here so the httpx-only path works without Playwright installed
+    from noon_laptop_scraper import noon_browser, scrape_urls
+
+    async with noon_browser() as context:
+        return await scrape_urls(context, urls)
+
+
+# All page requests overlap; the connection limit replaces the old sleep between pages
+page_records = asyncio.run(fetch_all(urls, headers=headers))
+
+# Noon usually serves static HTML to the mobile UA; only start a browser for pages where it did not
+missing = [i for i, rows in enumerate(page_records) if not rows]
+if missing:
+    print(f"No products in static HTML for pages {[i + 1 for i in missing]}, falling back to Playwright")
+    rendered = asyncio.run(render_with_playwright([urls[i] for i in missing]))
+    for i, rows in zip(missing, rendered):
+        page_records[i] = rows
+
+for page, rows in enumerate(page_records, start=1):
+    print(f"✅ Scraped page {page} with {len(rows)} products.")
 
 
 # Create the directory if it doesn't exist
@@ -94,7 +82,12 @@ os.makedirs(output_dir, exist_ok=True)  # Creates the folder structure if needed
 # Define the file path
 output_file = os.path.join(output_dir, "noon_gaming_laptops_v1.csv")
 
-# Save the DataFrame
-df.to_csv(output_file, index=False, encoding='utf-8')
+# Stream the rows to CSV in page order (no DataFrame is built for the export)
+write_records_csv((row for rows in page_records for row in rows), output_file)
+
+print(f"\n✅ Data saved to: {output_file}")
 
-print(f"\n✅ Data saved to: {output_file}")
\ No newline at end of file
+# Output
+df = pd.read_csv(output_file)
+print("\nDataFrame shape:", df.shape)
+print("Number of items scraped:", len(df))
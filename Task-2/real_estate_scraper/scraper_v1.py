@@ -3,10 +3,117 @@
 # ================================
 # Import required libraries for web scraping, browser automation, and data handling
 import requests
-from bs4 import BeautifulSoup
-from playwright.sync_api import sync_playwright
+from lxml import etree
+import lxml.html
+from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
 import pandas as pd
-import time
+import csv
+import hashlib
+import os
+
+
+# ================================
+# PRECOMPILED XPATH EXPRESSIONS
+# ================================
+# Compile each lookup once; every field is a string() expression evaluated inside libxml2, so no
+# element lists are built per property and a missing field simply comes back as ""
+def _has_class(*classes):
+    """XPath predicate matching elements that carry all the given classes (same semantics as CSS .a.b)."""
+    return " and ".join(f"contains(concat(' ', normalize-space(@class), ' '), ' {c} ')" for c in classes)
+
+
+XP_PROPERTY = etree.XPath(f"//div[{_has_class('sc-100c08da-0', 'eeBcMz')}]")                  # Property listing card
+XP_LOCATION = etree.XPath(f"string(.//div[{_has_class('area')}])")                              # Location of the property
+XP_NAME = etree.XPath(f"string(.//div[{_has_class('name')}])")                                  # Name/title of the property
+XP_DESCRIPTION = etree.XPath(f"string(.//h2[{_has_class('sc-4b9910fd-0', 'hyACaB')}])")         # Description headline
+XP_PRICE = etree.XPath(f"string(.//div[{_has_class('price-container')}]//span[{_has_class('price')}])")  # Price of the property
+# Feature blocks (area, beds, baths) that hold both a label and a value
+XP_FEATURE_BLOCK = etree.XPath(
+    f".//div[{_has_class('sc-234f71bd-0', 'bbWDeD')}][.//span[{_has_class('label')}]][.//span[{_has_class('value')}]]"
+)
+XP_LABEL = etree.XPath(f"string(.//span[{_has_class('label')}])")                               # Feature label (e.g., "m2", "beds")
+XP_VALUE = etree.XPath(f"string(.//span[{_has_class('value')}])")                               # Feature value (e.g., "120", "3")
+
+# CSS equivalents of the selectors above, used by the in-page extraction on live runs
+PROPERTY_CSS = "div.sc-100c08da-0.eeBcMz"
+FIELD_SELECTORS = {
+    "location": "div.area", "name": "div.name", "description": "h2.sc-4b9910fd-0.hyACaB",
+    "price": "div.price-container span.price", "feature": "div.sc-234f71bd-0.bbWDeD",
+    "label": "span.label", "value": "span.value",
+}
+
+# Runs inside the page on every property card and returns one small row object per card,
+# so the multi-MB DOM is never serialized across the CDP bridge (mirrors parse_properties)
+EXTRACT_PROPERTIES_JS = """
+(cards, sel) => cards.map(card => {
+    const text = s => card.querySelector(s)?.textContent.trim() ?? "";
+    const features = {};
+    for (const block of card.querySelectorAll(sel.feature)) {
+        const label = block.querySelector(sel.label);
+        const value = block.querySelector(sel.value);
+        if (label && value) features[label.textContent.trim().toLowerCase()] = value.textContent.trim();
+    }
+    return {
+        Location: text(sel.location),
+        Name: text(sel.name),
+        Description: text(sel.description),
+        Area: features["m2"] ?? "",
+        Beds: features["beds"] ?? "",
+        Baths: features["baths"] ?? "",
+        Price: text(sel.price)
+    };
+})
+"""
+
+# Output CSV columns, in order
+COLUMNS = ['Location', 'Name', 'Description', 'Area', 'Beds', 'Baths', 'Price']
+
+
+# ================================
+# RESOURCE BLOCKING
+# ================================
+# Only the listing text is scraped, so images, fonts, media, stylesheets and analytics are never downloaded
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media", "stylesheet"}
+BLOCKED_HOSTS = ("google-analytics.com", "googletagmanager.com", "doubleclick.net", "facebook.net", "hotjar.com")
+
+
+def block_heavy_resources(route):
+    """Abort requests for heavy or tracking resources; let everything else through."""
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or any(host in request.url for host in BLOCKED_HOSTS):
+        route.abort()
+    else:
+        route.continue_()
+
+
+# ================================
+# BROWSER LAUNCH FLAGS
+# ================================
+# Run Chromium headless without GPU init, /dev/shm limits or in-browser image decoding
+BROWSER_ARGS = ["--disable-gpu", "--disable-dev-shm-usage", "--blink-settings=imagesEnabled=false"]
+
+# Chromium's sandbox stays on by default; set CHROMIUM_NO_SANDBOX=1 only when running as root inside a container
+if os.getenv("CHROMIUM_NO_SANDBOX") == "1":
+    BROWSER_ARGS.append("--no-sandbox")
+
+
+# ================================
+# OPTIONAL HTML CACHE
+# ================================
+# During selector development, set SCRAPER_CACHE=1 to reuse the rendered page instead of scrolling it live again
+CACHE_DIR = ".cache"
+SCRAPER_CACHE = os.getenv("SCRAPER_CACHE") == "1"
+
+
+def scrape_rows(url, fresh=False):
+    """Return the property rows for url, parsed from .cache/ (keyed by URL SHA-1) when cached, otherwise read from the live page."""
+    key = hashlib.sha1(url.encode()).hexdigest()
+    path = os.path.join(CACHE_DIR, f"{key}.html")
+    if SCRAPER_CACHE and not fresh and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return parse_properties(f.read())
+
+    return _live_scrape(url, path if SCRAPER_CACHE else None)
 
 
 # ================================
@@ -15,6 +122,9 @@ import time
 # Define the target URL for the Nawy property search page (page 1)
 url = "https://www.nawy.com/search?page_number=1&category=property"
 
+# CSV file the scraped properties are streamed into
+OUTPUT_PATH = 'Task-2/real_estate_scraper/real_estate_properties.csv'
+
 # Make an initial GET request to the website (not used in final scraping but kept for reference)
 response = requests.get(url)
 
@@ -35,77 +145,98 @@ response = requests.get(url)
 # ================================
 # LAUNCH BROWSER WITH PLAYWRIGHT
 # ================================
-# Use Playwright to launch a Chromium browser instance for full JavaScript rendering
-with sync_playwright() as p:
-    # Launch the browser in non-headless mode (visible window)
-    browser = p.chromium.launch(headless=False)
+def _live_scrape(url, cache_path=None):
+    """Render the search page in Chromium, scroll until all listings load, and return the property rows."""
+    # Use Playwright to launch a Chromium browser instance for full JavaScript rendering
+    with sync_playwright() as p:
+        # Launch the browser in headless mode with lightweight flags
+        browser = p.chromium.launch(headless=True, args=BROWSER_ARGS)
     
-    # Open a new browser page
-    page = browser.new_page()
+        # Open a new browser page
+        page = browser.new_page()
+
+        # Skip downloading resources that are not needed for scraping text
+        page.context.route("**/*", block_heavy_resources)
     
-    # Navigate to the target URL
-    page.goto(url)
+        # Navigate to the target URL (the DOM is enough; we wait for the listings below)
+        page.goto(url, wait_until="domcontentloaded")
 
-    # Wait until the scrollable container (which holds the property listings) is loaded
-    page.wait_for_selector("div.sc-88b4dfdb-0.cgVQXi")
+        # Wait until the scrollable container (which holds the property listings) is loaded
+        page.wait_for_selector("div.sc-88b4dfdb-0.cgVQXi")
 
-    # ================================
-    # INFINITE SCROLL SIMULATION
-    # ================================
-    # Scroll down inside the scrollable container multiple times to load all properties
-    for _ in range(100):  # Repeat scroll action up to 100 times
-        page.evaluate("""
-            () => {
-                const container = document.querySelector('div.sc-88b4dfdb-0.cgVQXi');
-                if (container) {
-                    container.scrollBy(0, 1500);  // Scroll down by 1500px each time
+        # ================================
+        # INFINITE SCROLL SIMULATION
+        # ================================
+        # Scroll down inside the scrollable container until no new properties are loaded
+        stable_rounds = 0  # Consecutive scrolls after which the container stopped growing
+        for _ in range(100):  # Upper bound on scroll actions
+            height = page.evaluate("""
+                () => {
+                    const container = document.querySelector('div.sc-88b4dfdb-0.cgVQXi');
+                    if (!container) return 0;
+                    container.scrollBy(0, 1500);  // Scroll down by 1500 pixels
+                    return container.scrollHeight;
                 }
-            }
-        """)
-        time.sleep(5)  # Wait 5 seconds between scrolls to allow content to load
+            """)
+
+            # Wait until new content grows the container (or we are not at the bottom yet) instead of a fixed sleep
+            try:
+                page.wait_for_function("""
+                    h => {
+                        const container = document.querySelector('div.sc-88b4dfdb-0.cgVQXi');
+                        return !container
+                            || container.scrollHeight > h
+                            || container.scrollTop + container.clientHeight < container.scrollHeight - 1;
+                    }
+                """, arg=height, timeout=8000)
+                stable_rounds = 0
+            except PlaywrightTimeoutError:
+                # Nothing new loaded; stop after two stable rounds in a row
+                stable_rounds += 1
+                if stable_rounds >= 2:
+                    break
 
-    # ================================
-    # EXTRACT FULL PAGE HTML AFTER SCROLLING
-    # ================================
-    # After scrolling, retrieve the complete page HTML (now includes dynamically loaded content)
-    html = page.content()
+        # ================================
+        # EXTRACT PROPERTIES FROM THE LIVE DOM
+        # ================================
+        # After scrolling, read every property card in a single evaluate call instead of exporting the page HTML
+        rows = page.eval_on_selector_all(PROPERTY_CSS, EXTRACT_PROPERTIES_JS, FIELD_SELECTORS)
 
-    # Parse the HTML using BeautifulSoup for easier data extraction
-    soup = BeautifulSoup(html, "html.parser")
-    
-    # Find all property listing elements using the specific class name
-    Properties = soup.find_all('div', class_='sc-100c08da-0 eeBcMz')
+        # The full HTML is only serialized when it is going to be cached for selector development
+        if cache_path:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(cache_path, "w", encoding="utf-8") as f:
+                f.write(page.content())
 
+        # Close the browser now that the rows have been captured
+        browser.close()
 
-    # ================================
-    # DATA STORAGE INITIALIZATION
-    # ================================
-    # Initialize empty lists to store extracted property data
-    location_list = []
-    name_list = []
-    description_list = []
-    area_list = []
-    bed_list = []
-    bath_list = []
-    price_list = []
+    return rows
+
+
+# ================================
+# PARSE CACHED HTML
+# ================================
+def parse_properties(html):
+    """Parse a cached search page with lxml and return one row dict per property listing."""
+    # Parse the HTML into an lxml tree for fast XPath evaluation
+    tree = lxml.html.fromstring(html)
+
+    # Find all property listing elements using the specific class names
+    Properties = XP_PROPERTY(tree)
 
+    rows = []
 
     # ================================
     # EXTRACT DATA FROM EACH PROPERTY
     # ================================
     # Loop through each property element found on the page
     for property in Properties:
-        # Extract basic textual information using CSS selectors
-        location = property.select_one('div.area')                    # Location of the property
-        name = property.select_one('div.name')                       # Name/title of the property
-        description = property.select_one('h2.sc-4b9910fd-0.hyACaB') # Description headline
-        price = property.select_one('div.price-container span.price') # Price of the property
-
-        # Append text content if element exists; otherwise, append empty string
-        location_list.append(location.text.strip() if location else "")
-        name_list.append(name.text.strip() if name else "")
-        description_list.append(description.text.strip() if description else "")
-        price_list.append(price.text.strip() if price else "")
+        # Evaluate one compiled string() XPath per field (empty string when the element is missing)
+        location_text = XP_LOCATION(property).strip()
+        name_text = XP_NAME(property).strip()
+        description_text = XP_DESCRIPTION(property).strip()
+        price_text = XP_PRICE(property).strip()
 
         # Initialize default values for area, beds, and baths
         area_val = ""
@@ -116,64 +247,65 @@ with sync_playwright() as p:
         # EXTRACT FEATURE BLOCKS (AREA, BEDS, BATHS)
         # ================================
         # Some properties display additional details in labeled feature blocks
-        feature_blocks = property.select("div.sc-234f71bd-0.bbWDeD")  # Select all feature blocks
+        feature_blocks = XP_FEATURE_BLOCK(property)  # Select feature blocks that have both a label and a value
 
         # Loop through each feature block (e.g., "m2", "beds", "baths")
         for block in feature_blocks:
-            label = block.select_one("span.label")   # Label (e.g., "m2", "beds")
-            value = block.select_one("span.value")   # Value (e.g., "120", "3")
-
-            # If both label and value exist, process them
-            if label and value:
-                label_text = label.text.strip().lower()  # Normalize label to lowercase
-                value_text = value.text.strip()
-
-                # Match label to appropriate field and assign value
-                if label_text == "m2":
-                    area_val = value_text
-                elif label_text == "beds":
-                    bed_val = value_text
-                elif label_text == "baths":
-                    bath_val = value_text
-
-        # Append extracted feature values to their respective lists
-        area_list.append(area_val)
-        bed_list.append(bed_val)
-        bath_list.append(bath_val)
+            label_text = XP_LABEL(block).strip().lower()  # Label (e.g., "m2", "beds"), normalized to lowercase
+            value_text = XP_VALUE(block).strip()          # Value (e.g., "120", "3")
+
+            # Match label to appropriate field and assign value
+            if label_text == "m2":
+                area_val = value_text
+            elif label_text == "beds":
+                bed_val = value_text
+            elif label_text == "baths":
+                bath_val = value_text
+
+        # Collect all fields of this property as a single row
+        rows.append({
+            'Location': location_text,
+            'Name': name_text,
+            'Description': description_text,
+            'Area': area_val,
+            'Beds': bed_val,
+            'Baths': bath_val,
+            'Price': price_text
+        })
+
+    return rows
 
-    # ================================
-    # CLOSE BROWSER
-    # ================================
-    # Close the browser after scraping is complete
-    browser.close()
+
+# ================================
+# SCRAPE ROWS (LIVE OR FROM CACHE)
+# ================================
+# Live runs read the rows straight from the rendered DOM; with SCRAPER_CACHE=1 the cached page is re-parsed
+# in under a second so selector tweaks can be checked without scrolling the site again
+rows = scrape_rows(url)
 
 
 # ================================
-# DEBUG OUTPUT: PRINT SCRAPED DATA
+# WRITE CSV OUTPUT
 # ================================
-# Print all collected data to verify successful scraping
-print("Locations:", location_list)
-print("Names:", name_list)
-print("Descriptions:", description_list)
-print("Prices:", price_list)
-print("Areas:", area_list)
-print("Beds:", bed_list)
-print("Baths:", bath_list)
+# Rows are written straight to the CSV (no DataFrame is built for the export)
+with open(OUTPUT_PATH, "w", newline="", encoding="utf-8") as csv_file:
+    writer = csv.DictWriter(csv_file, fieldnames=COLUMNS)
+    writer.writeheader()
+    writer.writerows(rows)
 
 
 # ================================
 # CREATE PANDAS DATAFRAME
 # ================================
-# Combine all data lists into a structured DataFrame
-df = pd.DataFrame({
-    'Location': location_list,
-    'Name': name_list,
-    'Description': description_list,
-    'Area': area_list,
-    'Beds': bed_list,
-    'Baths': bath_list,
-    'Price': price_list
-})
+# Read the written CSV back for the summary output
+df = pd.read_csv(OUTPUT_PATH, dtype=str, keep_default_na=False)
+
+
+# ================================
+# DEBUG OUTPUT: PRINT SCRAPED DATA
+# ================================
+# Print all collected data to verify successful scraping
+print(df.to_string())
 
 
 # ================================
@@ -187,8 +319,8 @@ print(f"Number of properties scraped: {len(df)}")
 # ================================
 # SAVE DATA TO CSV FILE
 # ================================
-# Save the DataFrame to a CSV file without the index column
-df.to_csv('Task-2/real_estate_scraper/real_estate_properties.csv', index=False)
+# Rows were already written above; just report where they went
+print(f"Data saved to {OUTPUT_PATH}")
 
 
 # ================================
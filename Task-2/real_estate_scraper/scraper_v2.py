@@ -2,187 +2,286 @@
 # IMPORTS
 # ================================
 # Import required libraries for web scraping, browser automation, and data handling
-import requests
-from bs4 import BeautifulSoup
-from playwright.sync_api import sync_playwright
+from lxml import etree
+import lxml.html
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 import pandas as pd
-import time
+import asyncio
+import csv
 import os
+from contextlib import asynccontextmanager
 
 
-def scrape_nawy_properties(
-    url="https://www.nawy.com/search?page_number=1&category=property",
-    scroll_count=100,
-    scroll_wait=5,
-    scroll_distance=1500,
-    container_selector="div.sc-88b4dfdb-0.cgVQXi",
-    property_class="sc-100c08da-0 eeBcMz",
-    output_path="real_estate_properties.csv"
-):
+# ================================
+# PRECOMPILED XPATH EXPRESSIONS
+# ================================
+# Compile each lookup once; every field is a string() expression evaluated inside libxml2, so no
+# element lists are built per property and a missing field simply comes back as ""
+def _has_class(*classes):
+    """XPath predicate matching elements that carry all the given classes (same semantics as CSS .a.b)."""
+    return " and ".join(f"contains(concat(' ', normalize-space(@class), ' '), ' {c} ')" for c in classes)
+
+
+XP_LOCATION = etree.XPath(f"string(.//div[{_has_class('area')}])")                              # Location of the property
+XP_NAME = etree.XPath(f"string(.//div[{_has_class('name')}])")                                  # Name/title of the property
+XP_DESCRIPTION = etree.XPath(f"string(.//h2[{_has_class('sc-4b9910fd-0', 'hyACaB')}])")         # Description headline
+XP_PRICE = etree.XPath(f"string(.//div[{_has_class('price-container')}]//span[{_has_class('price')}])")  # Price of the property
+# Feature blocks (area, beds, baths) that hold both a label and a value
+XP_FEATURE_BLOCK = etree.XPath(
+    f".//div[{_has_class('sc-234f71bd-0', 'bbWDeD')}][.//span[{_has_class('label')}]][.//span[{_has_class('value')}]]"
+)
+XP_LABEL = etree.XPath(f"string(.//span[{_has_class('label')}])")                               # Feature label (e.g., "m2", "beds")
+XP_VALUE = etree.XPath(f"string(.//span[{_has_class('value')}])")                               # Feature value (e.g., "120", "3")
+
+# Output CSV columns, in order
+COLUMNS = ['Location', 'Name', 'Description', 'Area', 'Beds', 'Baths', 'Price']
+
+
+# ================================
+# RESOURCE BLOCKING
+# ================================
+# Only the listing text is scraped, so images, fonts, media, stylesheets and analytics are never downloaded
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media", "stylesheet"}
+BLOCKED_HOSTS = ("google-analytics.com", "googletagmanager.com", "doubleclick.net", "facebook.net", "hotjar.com")
+
+
+async def block_heavy_resources(route):
+    """Abort requests for heavy or tracking resources; let everything else through."""
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or any(host in request.url for host in BLOCKED_HOSTS):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+# ================================
+# BROWSER LAUNCH FLAGS
+# ================================
+# Run Chromium headless without GPU init, /dev/shm limits or in-browser image decoding
+BROWSER_ARGS = ["--disable-gpu", "--disable-dev-shm-usage", "--blink-settings=imagesEnabled=false"]
+
+# Chromium's sandbox stays on by default; set CHROMIUM_NO_SANDBOX=1 only when running as root inside a container
+if os.getenv("CHROMIUM_NO_SANDBOX") == "1":
+    BROWSER_ARGS.append("--no-sandbox")
+
+
+@asynccontextmanager
+async def nawy_browser():
     """
-    Scrapes real estate property data from Nawy.com using Playwright and BeautifulSoup.
-    
-    Parameters:
-    - url (str): The URL of the Nawy search page to scrape.
-    - scroll_count (int): Number of times to scroll down to load more properties.
-    - scroll_wait (float): Time to wait (in seconds) between each scroll.
-    - scroll_distance (int): Pixels to scroll down per iteration.
-    - container_selector (str): CSS selector for the scrollable container.
-    - property_class (str): Class name of individual property listing elements.
-    - output_path (str): File path to save the resulting CSV.
+    Starts Playwright and one headless Chromium instance, yields the browser, and closes it on exit.
 
-    Returns:
-    - pd.DataFrame: DataFrame containing scraped property data.
+    scrape_many uses it so every URL in a run shares a single browser start-up.
     """
-    
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True, args=BROWSER_ARGS)
+        try:
+            yield browser
+        finally:
+            await browser.close()
+
+
+async def _scrape_one(
+    browser,
+    url,
+    scroll_count,
+    scroll_wait,
+    scroll_distance,
+    container_selector,
+    property_xpath
+):
+    """Scroll one Nawy search page in its own tab of the shared browser and return its property rows."""
+
     # ================================
-    # INITIAL SETUP
+    # OPEN PAGE
     # ================================
-    # Make an initial GET request (kept for reference, not used in final scraping)
-    response = requests.get(url)
+    # Open a new browser page (in its own context)
+    page = await browser.new_page()
 
+    try:
+        # Skip downloading resources that are not needed for scraping text
+        await page.context.route("**/*", block_heavy_resources)
 
-    # ================================
-    # LAUNCH BROWSER WITH PLAYWRIGHT
-    # ================================
-    with sync_playwright() as p:
-        # Launch the browser in non-headless mode (visible window)
-        browser = p.chromium.launch(headless=True)
-        
-        # Open a new browser page
-        page = browser.new_page()
-        
-        # Navigate to the target URL
-        page.goto(url)
+        # Navigate to the target URL (the DOM is enough; we wait for the listings below)
+        await page.goto(url, wait_until="domcontentloaded")
 
         # Wait until the scrollable container (which holds the property listings) is loaded
-        page.wait_for_selector(container_selector)
+        await page.wait_for_selector(container_selector)
 
         # ================================
         # INFINITE SCROLL SIMULATION
         # ================================
-        # Scroll down inside the scrollable container multiple times to load all properties
-        for _ in range(scroll_count):
-            page.evaluate(f"""
+        # Scroll down inside the scrollable container until no new properties are loaded
+        stable_rounds = 0  # Consecutive scrolls after which the container stopped growing
+        for _ in range(scroll_count):  # Upper bound on scroll actions
+            height = await page.evaluate(f"""
                 () => {{
                     const container = document.querySelector('{container_selector}');
-                    if (container) {{
-                        container.scrollBy(0, {scroll_distance});  // Scroll down by specified pixels
-                    }}
+                    if (!container) return 0;
+                    container.scrollBy(0, {scroll_distance});  // Scroll down by specified pixels
+                    return container.scrollHeight;
                 }}
             """)
-            time.sleep(scroll_wait)  # Wait for content to load
+
+            # Wait until new content grows the container (or we are not at the bottom yet) instead of a fixed sleep
+            try:
+                await page.wait_for_function(f"""
+                    h => {{
+                        const container = document.querySelector('{container_selector}');
+                        return !container
+                            || container.scrollHeight > h
+                            || container.scrollTop + container.clientHeight < container.scrollHeight - 1;
+                    }}
+                """, arg=height, timeout=scroll_wait * 1000)
+                stable_rounds = 0
+            except PlaywrightTimeoutError:
+                # Nothing new loaded; stop after two stable rounds in a row
+                stable_rounds += 1
+                if stable_rounds >= 2:
+                    break
 
         # ================================
         # EXTRACT FULL PAGE HTML AFTER SCROLLING
         # ================================
         # After scrolling, retrieve the complete page HTML (now includes dynamically loaded content)
-        html = page.content()
+        html = await page.content()
+    finally:
+        # ================================
+        # CLOSE PAGE
+        # ================================
+        # Close the page (the browser itself is closed by scrape_many)
+        await page.close()
 
-        # Parse the HTML using BeautifulSoup for easier data extraction
-        soup = BeautifulSoup(html, "html.parser")
-        
-        # Find all property listing elements using the specified class name
-        Properties = soup.find_all('div', class_=property_class)
+    # Parse the HTML into an lxml tree for fast XPath evaluation
+    tree = lxml.html.fromstring(html)
 
+    # Find all property listing elements using the compiled property XPath
+    Properties = property_xpath(tree)
 
-        # ================================
-        # DATA STORAGE INITIALIZATION
-        # ================================
-        # Initialize empty lists to store extracted property data
-        location_list = []
-        name_list = []
-        description_list = []
-        area_list = []
-        bed_list = []
-        bath_list = []
-        price_list = []
+    rows = []
 
+    # ================================
+    # EXTRACT DATA FROM EACH PROPERTY
+    # ================================
+    # Loop through each property element found on the page
+    for property in Properties:
+        # Evaluate one compiled string() XPath per field (empty string when the element is missing)
+        location_text = XP_LOCATION(property).strip()
+        name_text = XP_NAME(property).strip()
+        description_text = XP_DESCRIPTION(property).strip()
+        price_text = XP_PRICE(property).strip()
+
+        # Initialize default values for area, beds, and baths
+        area_val = ""
+        bed_val = ""
+        bath_val = ""
 
         # ================================
-        # EXTRACT DATA FROM EACH PROPERTY
+        # EXTRACT FEATURE BLOCKS (AREA, BEDS, BATHS)
         # ================================
-        # Loop through each property element found on the page
-        for property in Properties:
-            # Extract basic textual information using CSS selectors
-            location = property.select_one('div.area')                    # Location of the property
-            name = property.select_one('div.name')                       # Name/title of the property
-            description = property.select_one('h2.sc-4b9910fd-0.hyACaB') # Description headline
-            price = property.select_one('div.price-container span.price') # Price of the property
-
-            # Append text content if element exists; otherwise, append empty string
-            location_list.append(location.text.strip() if location else "")
-            name_list.append(name.text.strip() if name else "")
-            description_list.append(description.text.strip() if description else "")
-            price_list.append(price.text.strip() if price else "")
-
-            # Initialize default values for area, beds, and baths
-            area_val = ""
-            bed_val = ""
-            bath_val = ""
-
-            # ================================
-            # EXTRACT FEATURE BLOCKS (AREA, BEDS, BATHS)
-            # ================================
-            # Some properties display additional details in labeled feature blocks
-            feature_blocks = property.select("div.sc-234f71bd-0.bbWDeD")  # Select all feature blocks
-
-            # Loop through each feature block (e.g., "m2", "beds", "baths")
-            for block in feature_blocks:
-                label = block.select_one("span.label")   # Label (e.g., "m2", "beds")
-                value = block.select_one("span.value")   # Value (e.g., "120", "3")
-
-                # If both label and value exist, process them
-                if label and value:
-                    label_text = label.text.strip().lower()  # Normalize label to lowercase
-                    value_text = value.text.strip()
-
-                    # Match label to appropriate field and assign value
-                    if label_text == "m2":
-                        area_val = value_text
-                    elif label_text == "beds":
-                        bed_val = value_text
-                    elif label_text == "baths":
-                        bath_val = value_text
-
-            # Append extracted feature values to their respective lists
-            area_list.append(area_val)
-            bed_list.append(bed_val)
-            bath_list.append(bath_val)
+        # Some properties display additional details in labeled feature blocks
+        feature_blocks = XP_FEATURE_BLOCK(property)  # Select feature blocks that have both a label and a value
+
+        # Loop through each feature block (e.g., "m2", "beds", "baths")
+        for block in feature_blocks:
+            label_text = XP_LABEL(block).strip().lower()  # Label (e.g., "m2", "beds"), normalized to lowercase
+            value_text = XP_VALUE(block).strip()          # Value (e.g., "120", "3")
+
+            # Match label to appropriate field and assign value
+            if label_text == "m2":
+                area_val = value_text
+            elif label_text == "beds":
+                bed_val = value_text
+            elif label_text == "baths":
+                bath_val = value_text
+
+        # Collect all fields of this property as a single row
+        rows.append({
+            'Location': location_text,
+            'Name': name_text,
+            'Description': description_text,
+            'Area': area_val,
+            'Beds': bed_val,
+            'Baths': bath_val,
+            'Price': price_text
+        })
+
+    print(f"✅ Scraped {url} with {len(rows)} properties.")
+    return rows
+
+
+async def scrape_many(
+    urls,
+    concurrency=3,
+    scroll_count=100,
+    scroll_wait=8,
+    scroll_distance=1500,
+    container_selector="div.sc-88b4dfdb-0.cgVQXi",
+    property_class="sc-100c08da-0 eeBcMz",
+    output_path="real_estate_properties.csv"
+):
+    """
+    Scrapes real estate property data from several Nawy.com search pages using one browser and a bounded pool of tabs.
 
-        # ================================
-        # CLOSE BROWSER
-        # ================================
-        # Close the browser after scraping is complete
-        browser.close()
+    Parameters:
+    - urls (list of str): The URLs of the Nawy search pages to scrape.
+    - concurrency (int): Maximum number of pages scrolled at the same time.
+    - scroll_count, scroll_wait, scroll_distance, container_selector, property_class, output_path:
+      Same as in scrape_nawy_properties; they apply to every URL.
+
+    Returns:
+    - pd.DataFrame: DataFrame containing the scraped property data of all URLs, in URL order.
+    """
+
+    # Compile the property XPath once for all pages
+    property_xpath = etree.XPath(f"//div[{_has_class(*property_class.split())}]")
+
+
+    # ================================
+    # SCRAPE ALL URLS IN A BOUNDED POOL
+    # ================================
+    # One browser start for the whole run; the semaphore caps how many tabs scroll at once
+    async with nawy_browser() as browser:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(url):
+            # A failing URL (e.g. a navigation or selector timeout) is logged and skipped; the other pages still count
+            async with semaphore:
+                try:
+                    return await _scrape_one(
+                        browser, url, scroll_count, scroll_wait, scroll_distance, container_selector, property_xpath
+                    )
+                except Exception as e:
+                    print(f"❌ Error on {url}: {e}")
+                    return []
+
+        results = await asyncio.gather(*(one(u) for u in urls))
+
+
+    # ================================
+    # WRITE CSV OUTPUT
+    # ================================
+    # All pages are written once, in URL order (no DataFrame is built for the export)
+    # Create directory if output path contains subfolders
+    os.makedirs(os.path.dirname(output_path), exist_ok=True) if os.path.dirname(output_path) else None
+    with open(output_path, "w", newline="", encoding="utf-8") as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=COLUMNS)
+        writer.writeheader()
+        for rows in results:
+            writer.writerows(rows)
 
 
     # ================================
     # CREATE PANDAS DATAFRAME
     # ================================
-    # Combine all data lists into a structured DataFrame
-    df = pd.DataFrame({
-        'Location': location_list,
-        'Name': name_list,
-        'Description': description_list,
-        'Area': area_list,
-        'Beds': bed_list,
-        'Baths': bath_list,
-        'Price': price_list
-    })
+    # Read the written CSV back for the summary output
+    df = pd.read_csv(output_path, dtype=str, keep_default_na=False)
 
 
     # ================================
     # DEBUG OUTPUT: PRINT SCRAPED DATA
     # ================================
     # Print all collected data to verify successful scraping
-    print("Locations:", location_list)
-    print("Names:", name_list)
-    print("Descriptions:", description_list)
-    print("Prices:", price_list)
-    print("Areas:", area_list)
-    print("Beds:", bed_list)
-    print("Baths:", bath_list)
+    print(df.to_string())
 
 
     # ================================
@@ -196,11 +295,7 @@ def scrape_nawy_properties(
     # ================================
     # SAVE DATA TO CSV FILE
     # ================================
-    # Create directory if output path contains subfolders
-    os.makedirs(os.path.dirname(output_path), exist_ok=True) if os.path.dirname(output_path) else None
-
-    # Save the DataFrame to a CSV file without the index column
-    df.to_csv(output_path, index=False)
+    # Rows were already written above; just report where they went
     print(f"Data saved to {output_path}")
 
     # ================================
@@ -209,6 +304,43 @@ def scrape_nawy_properties(
     return df
 
 
+def scrape_nawy_properties(
+    url="https://www.nawy.com/search?page_number=1&category=property",
+    scroll_count=100,
+    scroll_wait=8,
+    scroll_distance=1500,
+    container_selector="div.sc-88b4dfdb-0.cgVQXi",
+    property_class="sc-100c08da-0 eeBcMz",
+    output_path="real_estate_properties.csv"
+):
+    """
+    Scrapes real estate property data from Nawy.com using Playwright and lxml.
+
+    Parameters:
+    - url (str): The URL of the Nawy search page to scrape.
+    - scroll_count (int): Maximum number of scrolls; scrolling stops earlier once no new properties load.
+    - scroll_wait (float): Maximum time to wait (in seconds) for new properties after each scroll.
+    - scroll_distance (int): Pixels to scroll down per iteration.
+    - container_selector (str): CSS selector for the scrollable container.
+    - property_class (str): Class name of individual property listing elements.
+    - output_path (str): File path to save the resulting CSV.
+
+    Returns:
+    - pd.DataFrame: DataFrame containing scraped property data.
+
+    To scrape several pages, call scrape_many with a list of URLs instead of calling this in a loop.
+    """
+    return asyncio.run(scrape_many(
+        [url],
+        scroll_count=scroll_count,
+        scroll_wait=scroll_wait,
+        scroll_distance=scroll_distance,
+        container_selector=container_selector,
+        property_class=property_class,
+        output_path=output_path
+    ))
+
+
 # ================================
 # EXAMPLE USAGE OF THE FUNCTION
 # ================================
@@ -217,7 +349,7 @@ if __name__ == "__main__":
     df = scrape_nawy_properties(
         url="https://www.nawy.com/search?page_number=1&category=property",
         scroll_count=300,             # Reduced for testing; use 100 for full scrape
-        scroll_wait=5,
+        scroll_wait=8,
         scroll_distance=1500,
         container_selector="div.sc-88b4dfdb-0.cgVQXi",
         property_class="sc-100c08da-0 eeBcMz",
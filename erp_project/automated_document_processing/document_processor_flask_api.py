@@ -1,13 +1,15 @@
 import os
 import io
+import hashlib
 from dotenv import load_dotenv
 from PIL import Image
 import numpy as np
 import pytesseract
 from langchain_google_genai import ChatGoogleGenerativeAI
 from sentence_transformers import SentenceTransformer
-import json
+import orjson
 from pymongo import MongoClient
+from bson.binary import Binary, BinaryVectorDtype
 from flask import Flask, request, jsonify, send_file
 from werkzeug.utils import secure_filename
 import tempfile
@@ -73,6 +75,20 @@ def extract_text_from_file(file_stream, filename):
         raise Exception(f"Error extracting text: {str(e)}")
 
 # Function to detect document type
+def text_hash_of(text):
+    """Short BLAKE2b digest of the extracted text, stored with each document for duplicate checks."""
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+def find_existing_document(file_name, text_hash):
+    """Look for an already stored document with the same file name or text hash in any collection."""
+    query = {"$or": [{"file_name": file_name}, {"text_hash": text_hash}]}
+    projection = {"document_data": 1, "invoice_data": 1}
+    for doc_type, collection in collections.items():
+        existing_doc = collection.find_one(query, projection=projection)
+        if existing_doc:
+            return existing_doc, doc_type
+    return None, None
+
 def detect_document_type(text):
     """Use Gemini to classify document type"""
     classification_prompt = f"""
@@ -132,44 +148,46 @@ def extract_document():
         if not extracted_text:
             return jsonify({"error": "No text could be extracted from the file"}), 400
         
-        # 🆕 Step 1: Detect document type
+        # Step 1: Check duplicates (same file name or same text) before spending LLM calls
+        text_hash = text_hash_of(extracted_text)
+        existing_doc, existing_type = find_existing_document(filename, text_hash)
+        
+        if existing_doc:
+            return jsonify({
+                "warning": "Document already exists in database",
+                "existing_id": str(existing_doc["_id"]),
+                "document_type": existing_type,
+                "extracted_text": extracted_text,
+                "document_data": existing_doc.get("document_data", existing_doc.get("invoice_data"))
+            }), 200
+        
+        # 🆕 Step 2: Detect document type
         document_type = detect_document_type(extracted_text)
         collection = collections[document_type]
 
-        # Step 2: Extract structured data
+        # Step 3: Extract structured data
         message = f"""
         system: You are a document information extractor that converts text into structured JSON data.
         user: {extracted_text}
         """
         response = llm.invoke(message)
         result = response.content.strip().replace("```json", "").replace("```", "")
-        json_data = json.loads(result)
+        json_data = orjson.loads(result)
         
-        # Step 3: Create embeddings
-        embedding_vector = embedding_model.encode(extracted_text).tolist()
-        
-        # Step 4: Check duplicates
-        existing_doc = collection.find_one({
-            "$or": [
-                {"file_name": filename},
-                {"extracted_text": extracted_text}
-            ]
-        })
-        
-        if existing_doc:
-            return jsonify({
-                "warning": "Document already exists in database",
-                "existing_id": str(existing_doc["_id"]),
-                "document_type": document_type,
-                "extracted_text": extracted_text,
-                "document_data": json_data
-            }), 200
+        # Step 4: Create embeddings
+        # Unit-length vector, as required by the dotProduct vector index, stored as a
+        # BSON float32 vector like the documents written by stream_invoice.py
+        embedding_vector = Binary.from_vector(
+            embedding_model.encode(extracted_text, normalize_embeddings=True).astype(np.float32),
+            BinaryVectorDtype.FLOAT32
+        )
         
         # Step 5: Store in the correct collection
         insert_result = collection.insert_one({
             "file_name": filename,
             "document_type": document_type,
             "extracted_text": extracted_text,
+            "text_hash": text_hash,
             "document_data": json_data,
             "embedding": embedding_vector
         })
@@ -183,7 +201,7 @@ def extract_document():
             "document_data": json_data
         }), 201
         
-    except json.JSONDecodeError:
+    except orjson.JSONDecodeError:
         return jsonify({"error": "Invalid JSON response from AI model"}), 500
     except Exception as e:
         return jsonify({"error": f"Processing error: {str(e)}"}), 500
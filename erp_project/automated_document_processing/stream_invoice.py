@@ -1,13 +1,26 @@
 import os
+
+# Set writable cache directories (before transformers / sentence_transformers are imported)
+os.environ["HF_HOME"] = "/tmp/huggingface"
+os.environ["TRANSFORMERS_CACHE"] = "/tmp/huggingface"
+os.environ["SENTENCE_TRANSFORMERS_HOME"] = "/tmp/sentence_transformers"
+
 import io
+import re
+import asyncio
+import hashlib
+import threading
 from dotenv import load_dotenv
 from PIL import Image
 import numpy as np
 import pytesseract
 from langchain_google_genai import ChatGoogleGenerativeAI
 from sentence_transformers import SentenceTransformer
-import json
+import orjson
+import diskcache
 from pymongo import MongoClient
+from pymongo.errors import DuplicateKeyError
+from bson.binary import Binary, BinaryVectorDtype
 import streamlit as st
 
 # ==============================
@@ -18,57 +31,244 @@ load_dotenv()
 google_api_key = os.getenv("GEMINI_API_KEY")
 mongo_uri = os.getenv("MONGO_URI")
 
-# MongoDB setup with separate collections
-client = MongoClient(mongo_uri)
-db = client["invoice_reader_db"]
-
-collections = {
-    "invoice": db["invoices"],
-    "purchase_order": db["purchase_orders"],
-    "approval": db["approvals"]
-}
-
-llm = ChatGoogleGenerativeAI(
-    google_api_key=google_api_key,
-    temperature=0.1,
-    max_retries=2,
-    convert_system_message_to_human=True,
-    model="gemini-2.5-flash"
-)
-
-# Set writable cache directories
-os.environ["HF_HOME"] = "/tmp/huggingface"
-os.environ["TRANSFORMERS_CACHE"] = "/tmp/huggingface"
-os.environ["SENTENCE_TRANSFORMERS_HOME"] = "/tmp/sentence_transformers"
+# Heavy resources are created lazily and cached across Streamlit reruns and sessions
+
+@st.cache_resource
+def get_mongo_collections():
+    """MongoDB setup with separate collections (one shared, zstd-compressed client)."""
+    client = MongoClient(mongo_uri, maxPoolSize=50, compressors="zstd", retryWrites=True)
+    db = client["invoice_reader_db"]
+
+    collections = {
+        "invoice": db["invoices"],
+        "purchase_order": db["purchase_orders"],
+        "approval": db["approvals"]
+    }
+
+    # Indexes behind the duplicate check (sparse: documents stored before text_hash existed are skipped)
+    for collection in collections.values():
+        collection.create_index([("text_hash", 1)], unique=True, sparse=True)
+        collection.create_index([("file_name", 1)])
+
+    return collections
+
+
+@st.cache_resource
+def get_llm():
+    """Gemini chat model used for classification and extraction."""
+    return ChatGoogleGenerativeAI(
+        google_api_key=google_api_key,
+        temperature=0.1,
+        max_retries=2,
+        convert_system_message_to_human=True,
+        model="gemini-2.5-flash"
+    )
+
+
+@st.cache_resource
+def get_embedding_model():
+    """Multilingual sentence embedding model (weights stay resident between reruns)."""
+    model = SentenceTransformer('sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2')
+    # Cap inputs at the 128 tokens the model was trained on (fast Rust tokenizer truncates them)
+    model.max_seq_length = 128
+    # Warm-up: load the tokenizer vocab and run the first forward pass once per process
+    model.encode(["warmup"] * 2, batch_size=2, show_progress_bar=False)
+    return model
+
+
+@st.cache_resource
+def get_embedding_cache():
+    """Disk-backed embedding cache keyed by SHA-1 of the text (survives app restarts)."""
+    return diskcache.Cache("/tmp/embed_cache")
+
+
+@st.cache_resource
+def get_ocr_cache():
+    """Disk-backed OCR result cache keyed by SHA-1 of the uploaded image bytes."""
+    return diskcache.Cache("/tmp/ocr_cache")
 
-embedding_model = SentenceTransformer('sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2')
+
+@st.cache_resource
+def get_classification_cache():
+    """Disk-backed document-type cache keyed by SHA-1 of the classified text prefix."""
+    return diskcache.Cache("/tmp/doc_cls_cache")
 
 # ==============================
 # Helper Functions
 # ==============================
 
+def embed(texts):
+    """Embed a list of texts, reusing cached vectors and encoding only the misses in one batch."""
+    cache = get_embedding_cache()
+    keys = [hashlib.sha1(t.encode()).hexdigest() for t in texts]
+    out = [cache.get(k) for k in keys]
+
+    missing = [i for i, vec in enumerate(out) if vec is None]
+    if missing:
+        vecs = get_embedding_model().encode(
+            [texts[i] for i in missing],
+            batch_size=32,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
+        for i, vec in zip(missing, vecs):
+            cache.set(keys[i], vec)
+            out[i] = vec
+
+    return np.stack(out)
+
+
+# Whitespace words per embedding chunk (keeps chunks within the model's 128-token window)
+CHUNK_WORDS = 100
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.\n])\s+")
+
+
+def chunk_text(text, max_words=CHUNK_WORDS):
+    """Greedily pack sentence-ish pieces of text into chunks of at most max_words words."""
+    chunks, current = [], []
+    for piece in _SENTENCE_SPLIT_RE.split(text):
+        words = piece.split()
+        # Pieces longer than max_words are cut into max_words slices
+        for start in range(0, len(words), max_words):
+            part = words[start:start + max_words]
+            if current and len(current) + len(part) > max_words:
+                chunks.append(" ".join(current))
+                current = []
+            current.extend(part)
+    if current:
+        chunks.append(" ".join(current))
+    return chunks or [text]
+
+
+def embed_document(text):
+    """Embed a whole document: all chunks in one batch, mean-pooled and re-normalized to unit length."""
+    vec = embed(chunk_text(text)).mean(axis=0)
+    return vec / max(np.linalg.norm(vec), 1e-12)
+
+
+# Tesseract settings: LSTM engine, single text block, English + Arabic
+OCR_CONFIG = "--oem 1 --psm 6 -l eng+ara"
+
+# Longest image side (pixels) passed to OCR; larger phone photos are downscaled
+OCR_MAX_SIDE = 2200
+
+
+def otsu_threshold(arr):
+    """Return the Otsu threshold of a uint8 grayscale array (maximizes between-class variance)."""
+    hist = np.bincount(arr.ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256)
+    weight_bg = np.cumsum(hist)
+    weight_fg = weight_bg[-1] - weight_bg
+    mean_sum = np.cumsum(hist * levels)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_bg = mean_sum / weight_bg
+        mean_fg = (mean_sum[-1] - mean_sum) / weight_fg
+        variance = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    return int(np.argmax(np.nan_to_num(variance)))
+
+
+def prepare_image_for_ocr(image):
+    """Downscale to OCR_MAX_SIDE and binarize with Otsu so tesseract processes far fewer bytes."""
+    gray_image = image.convert("L")
+
+    scale = min(1.0, OCR_MAX_SIDE / max(gray_image.size))
+    if scale < 1.0:
+        w, h = gray_image.size
+        gray_image = gray_image.resize((int(w * scale), int(h * scale)), Image.BILINEAR)
+
+    arr = np.asarray(gray_image)
+    thresh = otsu_threshold(arr)
+    return Image.fromarray((arr > thresh).astype(np.uint8) * 255)
+
+
+def extract_text_from_pdf(uploaded_file):
+    """Extract PDF text with PyMuPDF, falling back to pdfplumber if PyMuPDF is not installed."""
+    try:
+        import fitz
+    except ImportError:
+        import pdfplumber
+        with pdfplumber.open(uploaded_file) as pdf:
+            return "\n".join(page.extract_text() or "" for page in pdf.pages)
+
+    with fitz.open(stream=uploaded_file.read(), filetype="pdf") as doc:
+        return "\n".join(page.get_text("text") for page in doc)
+
+
 def extract_text_from_file(uploaded_file):
     """Extract text from PDF or image."""
     try:
         if uploaded_file.name.lower().endswith(".pdf"):
-            import pdfplumber
-            text = ""
-            with pdfplumber.open(uploaded_file) as pdf:
-                for page in pdf.pages:
-                    text += page.extract_text() or ""
-            return text.strip()
+            return extract_text_from_pdf(uploaded_file).strip()
         else:
-            image = Image.open(uploaded_file)
-            gray_image = image.convert("L")
-            extracted_text = pytesseract.image_to_string(gray_image).strip()
+            # OCR is the slowest step, so re-uploads of the same image reuse the cached text
+            image_bytes = uploaded_file.getvalue()
+            image_key = hashlib.sha1(image_bytes + OCR_CONFIG.encode()).hexdigest()
+            ocr_cache = get_ocr_cache()
+            if image_key in ocr_cache:
+                return ocr_cache[image_key]
+
+            image = Image.open(io.BytesIO(image_bytes))
+            bw_image = prepare_image_for_ocr(image)
+            extracted_text = pytesseract.image_to_string(bw_image, config=OCR_CONFIG).strip()
+            ocr_cache[image_key] = extracted_text
             return extracted_text
     except Exception as e:
         st.error(f"Error extracting text: {str(e)}")
         return None
 
 
-def detect_document_type(text):
-    """Use Gemini to classify document type."""
+def text_hash_of(text):
+    """Short BLAKE2b digest of the extracted text, stored with each document for duplicate checks."""
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def find_existing_document(file_name, text_hash):
+    """Look for an already stored document with the same file name or text hash in any collection."""
+    query = {"$or": [{"file_name": file_name}, {"text_hash": text_hash}]}
+    projection = {"document_data": 1, "invoice_data": 1}
+    for doc_type, collection in get_mongo_collections().items():
+        existing_doc = collection.find_one(query, projection=projection)
+        if existing_doc:
+            return existing_doc, doc_type
+    return None, None
+
+
+# Characters of the document sent for classification (the header almost always identifies the type)
+CLASSIFY_PREFIX_CHARS = 800
+
+
+# Markdown code fence Gemini wraps around its JSON (```json ... ```), stripped in one pass
+_FENCE_RE = re.compile(r"\A```(?:json)?\s*|\s*```\Z")
+
+# Upper bound on Gemini requests in flight across all sessions (keeps bursts under the API rate limit)
+LLM_CONCURRENCY = 8
+
+
+async def _new_llm_semaphore():
+    return asyncio.Semaphore(LLM_CONCURRENCY)
+
+
+@st.cache_resource
+def get_llm_loop():
+    """One long-lived event loop (on a daemon thread) that runs every async Gemini call, plus its semaphore.
+
+    The cached Gemini model keeps its async gRPC client on the loop it was first used from, so all
+    ainvoke calls must go through this loop rather than a fresh asyncio.run() loop per upload.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    semaphore = asyncio.run_coroutine_threadsafe(_new_llm_semaphore(), loop).result()
+    return loop, semaphore
+
+
+async def detect_document_type(text, llm, cache, semaphore):
+    """Use Gemini to classify document type (cached by a hash of the classified prefix); LLM errors propagate."""
+    prefix = text[:CLASSIFY_PREFIX_CHARS]
+    cache_key = hashlib.sha1(prefix.encode()).hexdigest()
+    if cache_key in cache:
+        return cache[cache_key]
+
     classification_prompt = f"""
     You are a document classifier. Based on the text below, classify the document type into one of:
     - invoice
@@ -77,22 +277,52 @@ def detect_document_type(text):
     Respond with ONLY one of these words.
 
     Document text:
-    {text[:3000]}
+    {prefix}
     """
-    try:
-        response = llm.invoke(classification_prompt)
-        doc_type = response.content.strip().lower()
-        if "invoice" in doc_type:
-            return "invoice"
-        elif "purchase" in doc_type or "order" in doc_type:
-            return "purchase_order"
-        elif "approval" in doc_type:
-            return "approval"
-        else:
-            return "invoice"  # fallback
-    except Exception as e:
-        st.warning(f"Could not classify document: {e}")
-        return "invoice"
+    async with semaphore:
+        response = await llm.ainvoke(classification_prompt)
+    doc_type = response.content.strip().lower()
+    if "invoice" in doc_type:
+        result = "invoice"
+    elif "purchase" in doc_type or "order" in doc_type:
+        result = "purchase_order"
+    elif "approval" in doc_type:
+        result = "approval"
+    else:
+        result = "invoice"  # fallback
+
+    cache[cache_key] = result
+    return result
+
+
+async def extract_document_data(text, llm, semaphore):
+    """Ask Gemini for the structured JSON of the document (type-agnostic, so it can run alongside classification)."""
+    message = f"""
+    system: You are a business document (invoice, purchase order or approval) information extractor who converts document text into structured JSON with proper key-value pairs.
+    user: {text}
+    """
+    async with semaphore:
+        return await llm.ainvoke(message)
+
+
+def classify_and_extract(text):
+    """Run classification and extraction concurrently on the shared LLM loop.
+
+    Returns (doc_type or exception, extraction response or exception). Streamlit objects are resolved
+    here on the script thread; only plain coroutines run on the loop thread.
+    """
+    loop, semaphore = get_llm_loop()
+    llm = get_llm()
+    cache = get_classification_cache()
+
+    async def both():
+        return await asyncio.gather(
+            detect_document_type(text, llm, cache, semaphore),
+            extract_document_data(text, llm, semaphore),
+            return_exceptions=True
+        )
+
+    return asyncio.run_coroutine_threadsafe(both(), loop).result()
 
 
 # ==============================
@@ -120,47 +350,44 @@ if uploaded_file is not None:
             st.subheader("🧾 Extracted Text")
             st.text(extracted_text)
 
-            # Step 1: Detect document type
-            with st.spinner("Classifying document type..."):
-                doc_type = detect_document_type(extracted_text)
+            # Step 1: Skip documents that are already stored (before any Gemini or embedding work)
+            text_hash = text_hash_of(extracted_text)
+            existing_doc, existing_type = find_existing_document(uploaded_file.name, text_hash)
+            if existing_doc:
+                st.warning(f"⚠️ This {existing_type.replace('_', ' ')} already exists in the database.")
+                st.json(existing_doc.get("document_data", existing_doc.get("invoice_data", {})))
+                st.stop()
+
+            # Step 2 + 3: Detect document type and extract structured data (both Gemini calls overlap)
+            with st.spinner("Classifying and processing with Gemini..."):
+                doc_type, response = classify_and_extract(extracted_text)
+            if isinstance(doc_type, Exception):
+                st.warning(f"Could not classify document: {doc_type}")
+                doc_type = "invoice"
             st.success(f"✅ Detected Document Type: **{doc_type.replace('_', ' ').title()}**")
 
-            # Step 2: Process structured extraction
             st.subheader("🤖 Processing with Gemini...")
-            message = f"""
-            system: You are a {doc_type.replace('_', ' ')} information extractor who converts document text into structured JSON with proper key-value pairs.
-            user: {extracted_text}
-            """
-
             try:
-                response = llm.invoke(message)
-                result = response.content.strip().replace("```json", "").replace("```", "")
-                json_data = json.loads(result)
-
-                # Step 3: Embedding
-                embedding_vector = embedding_model.encode(extracted_text).tolist()
-
-                # Step 4: Save to MongoDB
-                collection = collections[doc_type]
-                existing_doc = collection.find_one({
-                    "$or": [
-                        {"file_name": uploaded_file.name},
-                        {"extracted_text": extracted_text}
-                    ]
-                })
+                if isinstance(response, Exception):
+                    raise response
+                result = _FENCE_RE.sub("", response.content.strip())
+                json_data = orjson.loads(result)
 
-                if existing_doc:
-                    st.warning(f"⚠️ This {doc_type.replace('_', ' ')} already exists in the database.")
-                    st.json(existing_doc.get("document_data", existing_doc.get("invoice_data", {})))
-                else:
-                    insert_result = collection.insert_one({
-                        "file_name": uploaded_file.name,
-                        "document_type": doc_type,
-                        "extracted_text": extracted_text,
-                        "document_data": json_data,
-                        "embedding": embedding_vector
-                    })
-                    st.success(f"✅ Saved to MongoDB in **{doc_type}** collection (ID: {insert_result.inserted_id})")
+                # Step 4: Embedding and save to MongoDB
+                # Stored as a BSON float32 vector (raw bytes, ~3x smaller than an array of doubles)
+                embedding_vector = Binary.from_vector(
+                    embed_document(extracted_text).astype(np.float32), BinaryVectorDtype.FLOAT32
+                )
+                collection = get_mongo_collections()[doc_type]
+                insert_result = collection.insert_one({
+                    "file_name": uploaded_file.name,
+                    "document_type": doc_type,
+                    "extracted_text": extracted_text,
+                    "text_hash": text_hash,
+                    "document_data": json_data,
+                    "embedding": embedding_vector
+                })
+                st.success(f"✅ Saved to MongoDB in **{doc_type}** collection (ID: {insert_result.inserted_id})")
 
                 # Step 5: Show structured data
                 st.subheader("📋 Extracted Information (JSON)")
@@ -169,12 +396,14 @@ if uploaded_file is not None:
                 # Step 6: Download option
                 st.download_button(
                     label="💾 Download Extracted JSON",
-                    data=json.dumps(json_data, indent=4),
+                    data=orjson.dumps(json_data, option=orjson.OPT_INDENT_2),
                     file_name=f"{doc_type}_data.json",
                     mime="application/json"
                 )
 
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 st.error("Invalid JSON from AI model. Please try again.")
+            except DuplicateKeyError:
+                st.warning("⚠️ The same document was stored by another upload in the meantime.")
             except Exception as e:
                 st.error(f"Error processing document: {str(e)}")
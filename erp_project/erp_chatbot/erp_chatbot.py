@@ -1,7 +1,17 @@
 import os
+import asyncio
+import concurrent.futures
+import queue
+import threading
+import time
+from contextlib import nullcontext
+from functools import lru_cache
 import streamlit as st
 from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+from bson.binary import Binary, BinaryVectorDtype
 from sentence_transformers import SentenceTransformer
+import torch
 from langchain_google_genai import ChatGoogleGenerativeAI
 import numpy as np
 from dotenv import load_dotenv
@@ -15,14 +25,106 @@ mongo_uri = os.getenv("MONGO_URI")
 google_api_key = os.getenv("GEMINI_API_KEY")
 
 # --- Initialize MongoDB connection ---
-client = MongoClient(mongo_uri)
-db = client["invoice_reader_db"]
+# One pooled client shared by all reruns and sessions; zstd compresses extracted_text and vectors on the wire
+@st.cache_resource
+def get_mongo():
+    client = MongoClient(mongo_uri, maxPoolSize=50, compressors="zstd", retryWrites=True)
+    # Warm-up: do the TLS/auth handshake now instead of on the first question (best effort)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        pass
+    return client
+
+db = get_mongo()["invoice_reader_db"]
 collection = db["invoices"]
 
+# --- Quantized ONNX embedder ---
+# Built offline once with:
+#   optimum-cli export onnx --model sentence-transformers/all-MiniLM-L6-v2 --task feature-extraction --opset 17 ./minilm_onnx
+#   optimum-cli onnxruntime quantize --onnx_model ./minilm_onnx --avx512_vnni -o ./minilm_q
+# If the quantized model is not there, the PyTorch SentenceTransformer is used instead.
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "./minilm_q")
+
+
+class ORTSentenceEmbedder:
+    """INT8 ONNX Runtime build of all-MiniLM-L6-v2 exposing the SentenceTransformer encode() interface."""
+
+    def __init__(self, model_dir, max_length=256):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        so = ort.SessionOptions()
+        so.intra_op_num_threads = os.cpu_count()
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, "model_quantized.onnx"),
+            sess_options=so,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained("sentence-transformers/all-MiniLM-L6-v2")
+        self.max_length = max_length
+
+    def encode(self, sentences, batch_size=32, show_progress_bar=False, convert_to_numpy=True, normalize_embeddings=False):
+        """Tokenize, run the session and mean-pool over the attention mask (optionally L2-normalized)."""
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+
+        batches = []
+        for start in range(0, len(sentences), batch_size):
+            encoded = self.tokenizer(
+                sentences[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np"
+            )
+            feeds = {name: encoded[name].astype(np.int64) for name in self.input_names if name in encoded}
+            token_embeddings = self.session.run(None, feeds)[0]
+
+            # Mean pooling: average token vectors, ignoring padding
+            mask = encoded["attention_mask"][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if normalize_embeddings:
+                pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            batches.append(pooled.astype(np.float32))
+
+        vectors = np.concatenate(batches)
+        return vectors[0] if single else vectors
+
+
 # --- Initialize models ---
+# MiniLM was trained on 128-token sequences; capping inputs there bounds attention cost for long queries
+EMBED_MAX_SEQ_LENGTH = 128
+
+# Opt-in BF16 inference through Intel Extension for PyTorch (only for CPUs with AVX512-BF16 / AMX)
+USE_IPEX_BF16 = os.getenv("USE_IPEX_BF16") == "1"
+
+
+def bf16_inference():
+    """BF16 autocast context for the IPEX-optimized embedder (a no-op unless USE_IPEX_BF16=1)."""
+    if not USE_IPEX_BF16:
+        return nullcontext()
+    return torch.autocast("cpu", dtype=torch.bfloat16)
+
+
 @st.cache_resource
 def load_models():
-    embedder = SentenceTransformer("all-MiniLM-L6-v2")
+    if os.path.exists(os.path.join(ONNX_MODEL_DIR, "model_quantized.onnx")):
+        embedder = ORTSentenceEmbedder(ONNX_MODEL_DIR, max_length=EMBED_MAX_SEQ_LENGTH)
+    else:
+        embedder = SentenceTransformer("all-MiniLM-L6-v2")
+        embedder.max_seq_length = EMBED_MAX_SEQ_LENGTH
+        if USE_IPEX_BF16:
+            import intel_extension_for_pytorch as ipex
+            transformer = embedder._first_module()
+            transformer.auto_model = ipex.optimize(transformer.auto_model.eval(), dtype=torch.bfloat16)
+
+    # Warm-up: load the tokenizer vocab and run the first forward pass before any user asks
+    with torch.no_grad(), bf16_inference():
+        embedder.encode(["warmup"] * 2, batch_size=2, show_progress_bar=False)
     llm = ChatGoogleGenerativeAI(
         google_api_key=google_api_key,
         temperature=0.1,
@@ -34,51 +136,142 @@ def load_models():
 
 embedder, llm = load_models()
 
+# --- Query embedding micro-batching ---
+# Encode requests arriving within MAX_WAIT_MS of each other (from any session) share one forward pass
+MAX_BATCH = 32
+MAX_WAIT_MS = 15
+
+
+class EmbeddingService:
+    """Coalesces concurrent encode requests into batched embedder.encode calls on one worker thread."""
+
+    def __init__(self, embedder):
+        self.embedder = embedder
+        self.pending = queue.Queue()
+        threading.Thread(target=self._worker, daemon=True).start()
+
+    def _worker(self):
+        while True:
+            # Block for the first request, then keep collecting until the batch is full or the window closes
+            batch = [self.pending.get()]
+            deadline = time.monotonic() + MAX_WAIT_MS / 1000
+            while len(batch) < MAX_BATCH:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Normalized to unit length so the vector index can use dotProduct instead of cosine
+            try:
+                with torch.no_grad(), bf16_inference():
+                    vectors = self.embedder.encode(
+                        [text for text, _ in batch],
+                        batch_size=MAX_BATCH,
+                        show_progress_bar=False,
+                        convert_to_numpy=True,
+                        normalize_embeddings=True
+                    )
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+    async def encode(self, text):
+        """Queue text for the next batch and return its embedding as a numpy array."""
+        future = concurrent.futures.Future()
+        self.pending.put((text, future))
+        return await asyncio.wrap_future(future)
+
+
+@st.cache_resource
+def get_embedding_service():
+    return EmbeddingService(embedder)
+
+embedding_service = get_embedding_service()
+
+
+# --- Query embedding cache ---
+# Repeated questions skip the transformer entirely; the LRU lives in a cached resource so it survives reruns.
+# Vectors are kept as BSON float32 binary vectors, so the raw IEEE-754 bytes go to MongoDB without a Python float list.
+@st.cache_resource
+def get_cached_encode():
+    @lru_cache(maxsize=4096)
+    def cached_encode(query):
+        vector = asyncio.run(embedding_service.encode(query)).astype(np.float32)
+        return Binary.from_vector(vector, BinaryVectorDtype.FLOAT32)
+    return cached_encode
+
+cached_encode = get_cached_encode()
+
 # --- Streamlit UI ---
 st.title("🧠 ERP Invoice Chatbot")
 st.write("Ask questions about your invoices stored in MongoDB!")
 
+# --- Vector search settings ---
+# numCandidates is the HNSW candidate pool; Atlas recommends 10-20x limit for good recall. Together with the
+# normalized embeddings this buys more recall per millisecond than raising limit does.
+VS_LIMIT = 3
+NUM_CANDIDATES_MULTIPLIER = int(os.getenv("VS_CANDIDATES_MULT", "20"))
+num_candidates = st.sidebar.slider(
+    "numCandidates", 10, 500, min(500, max(50, VS_LIMIT * NUM_CANDIDATES_MULTIPLIER)),
+    help="Candidates scanned by $vectorSearch before the top results are returned"
+)
+
 query = st.text_input("💬 Enter your question:", placeholder="e.g. What is the seller name in invoice number us-001?")
 
 if st.button("Ask") and query:
     with st.spinner("Searching and generating answer..."):
         # Encode query
-        query_embedding = embedder.encode(query).tolist()
+        query_embedding = cached_encode(query)
 
-        # MongoDB vector search
-        results = collection.aggregate([
+        # MongoDB vector search (batchSize = limit, so every hit arrives in the first reply)
+        cursor = collection.aggregate([
             {
                 "$vectorSearch": {
                     "queryVector": query_embedding,
                     "path": "embedding",
-                    "numCandidates": 5,
-                    "limit": 3,
+                    "numCandidates": num_candidates,
+                    "limit": VS_LIMIT,
                     "index": "invoice_vector_index"
                 }
-            }
-        ])
+            },
+            # Only the text is rendered, so the embedding and everything else stay on the server
+            {"$project": {"extracted_text": 1, "_id": 0}}
+        ], batchSize=VS_LIMIT)
 
-        results_list = list(results)
+        # Build the context straight from the cursor (no intermediate list of full result documents)
+        retrieved_docs = [doc.get("extracted_text", "") for doc in cursor]
 
-        if not results_list:
+        if not retrieved_docs:
             st.warning("No relevant documents found.")
         else:
             # Combine context
-            retrieved_docs = [r.get("extracted_text", "") for r in results_list]
             context = "\n\n".join(retrieved_docs)
 
             # Create prompt
             prompt = f"Answer the question based only on the following context:\n{context}\n\nQuestion: {query}"
 
-            # LLM response
-            response = llm.invoke(prompt)
-            answer = response.content
-
+            # LLM response, rendered token by token as Gemini produces it (returns the full answer text)
             st.subheader("🧾 Answer")
-            st.write(answer)
+            answer = st.write_stream(chunk.content for chunk in llm.stream(prompt))
 
             # Expandable context
             with st.expander("Show retrieved invoice texts"):
                 for i, doc in enumerate(retrieved_docs):
                     st.markdown(f"**Document {i+1}:**")
                     st.text(doc)
+
+# --- Sidebar: embedding cache stats ---
+cache_info = cached_encode.cache_info()
+lookups = cache_info.hits + cache_info.misses
+st.sidebar.metric(
+    "Query embedding cache hit ratio",
+    f"{cache_info.hits / lookups:.0%}" if lookups else "n/a",
+    help=f"{cache_info.hits} hits / {lookups} lookups, {cache_info.currsize} cached queries"
+)
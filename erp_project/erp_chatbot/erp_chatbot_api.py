@@ -1,6 +1,8 @@
 import os
 from flask import Flask, request, jsonify
+import numpy as np
 from pymongo import MongoClient
+from bson.binary import Binary, BinaryVectorDtype
 from sentence_transformers import SentenceTransformer
 from langchain_google_genai import ChatGoogleGenerativeAI
 from dotenv import load_dotenv
@@ -24,6 +26,11 @@ collections = {
     "approval": db["approvals"]
 }
 
+# $vectorSearch candidate pool per requested result (Atlas recommends 10-20x limit for good recall)
+NUM_CANDIDATES_MULTIPLIER = int(os.getenv("VS_CANDIDATES_MULT", "20"))
+MAX_NUM_CANDIDATES = 10000  # Atlas rejects larger values
+MAX_NUM_RESULTS = 100
+
 # Set cache directories
 os.environ["HF_HOME"] = "/tmp/huggingface"
 os.environ["TRANSFORMERS_CACHE"] = "/tmp/huggingface"
@@ -140,6 +147,12 @@ def query_invoices():
                 "error": f"Invalid collections: {invalid_collections}. Valid options: {list(collections.keys())}"
             }), 400
         
+        if not isinstance(num_results, int) or not 1 <= num_results <= MAX_NUM_RESULTS:
+            return jsonify({
+                "success": False,
+                "error": f"'num_results' must be an integer between 1 and {MAX_NUM_RESULTS}"
+            }), 400
+
         if not query.strip():
             return jsonify({
                 "success": False,
@@ -147,7 +160,12 @@ def query_invoices():
             }), 400
         
         # Encode query
-        query_embedding = embedder.encode(query).tolist()
+        # Normalized, so the dotProduct vector index ranks exactly like cosine;
+        # sent as a BSON float32 vector to match the stored embeddings
+        query_embedding = Binary.from_vector(
+            embedder.encode(query, normalize_embeddings=True).astype(np.float32),
+            BinaryVectorDtype.FLOAT32
+        )
         
         # Search across specified collections
         all_results = []
@@ -160,11 +178,18 @@ def query_invoices():
                     "$vectorSearch": {
                         "queryVector": query_embedding,
                         "path": "embedding",
-                        "numCandidates": 5,
+                        "numCandidates": min(MAX_NUM_CANDIDATES, max(50, num_results * NUM_CANDIDATES_MULTIPLIER)),
                         "limit": num_results,
                         "index": "vector_index"  # Make sure this index exists for each collection
                     }
                 },
+                {
+                    # The embedding and _id are never returned, so do not ship them back from the server
+                    "$project": {
+                        "embedding": 0,
+                        "_id": 0
+                    }
+                },
                 {
                     "$addFields": {
                         "collection_type": collection_name